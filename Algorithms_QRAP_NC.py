@@ -14,36 +14,104 @@ Copyright (c) 2021 Martijn Schoot Uiterkamp
 
 import math
 import numpy
-from collections import deque
-import statistics
-import heapq
+from numba import njit
 
 
+#Tolerance for comparing multipliers and sums of variables
+_EPS = 1e-6
 
-def QRAP_median(objective_par,lower_bound,upper_bound,resource_value):
-    #Solve an instance of QRAP using a meidan-find approach
+#Tolerance for violations of nested constraints in QRAP_NC_infeasible (float64 and float32 mode)
+_TOL = 1e-5
+_TOL_FLOAT32 = 1e-4
+
+
+
+def _check_lengths(num_var,*arrays):
+    #The compiled kernels do not check bounds, so all parameter arrays must have length num_var before they are handed over
+    for array in arrays:
+        if len(array) != num_var:
+            raise ValueError("all parameter arrays must have length %d, got one of length %d" % (num_var, len(array)))
+
+
+
+@njit(cache=True)
+def _select(values, start_index, end_index, position):
+    #Three-way quickselect on values[start_index:end_index] (in place)
+    #Returns the value of rank position and the block [equal_start,equal_end) of entries equal to it: all entries before this block are smaller and all entries after it are larger
+    left = start_index
+    right = end_index
+    while True:
+        pivot = values[(left + right)//2]
+        equal_start = left
+        equal_end = right
+        i = left
+        while i < equal_end:
+            if values[i] < pivot:
+                HELP_value = values[i]
+                values[i] = values[equal_start]
+                values[equal_start] = HELP_value
+                equal_start += 1
+                i += 1
+            elif values[i] > pivot:
+                equal_end -= 1
+                HELP_value = values[i]
+                values[i] = values[equal_end]
+                values[equal_end] = HELP_value
+            else:
+                i += 1
+        if position < equal_start:
+            right = equal_start
+        elif position >= equal_end:
+            left = equal_end
+        else:
+            return pivot, equal_start, equal_end
+
+
+
+@njit(cache=True)
+def _QRAP_median_multiplier(objective_par,lower_bound,upper_bound,resource_value,inv_par=None,breakpoint_dtype=numpy.float64,known_lower_breakpoints=None,known_upper_breakpoints=None):
+    #Compute the optimal multiplier of an instance of QRAP using a median-find approach
+    #If given, inv_par holds the reciprocals 1/objective_par, so that the breakpoints are computed with multiplications
+    #The breakpoints are stored as breakpoint_dtype (numpy.float32 halves the memory traffic of the median searches); all sums stay in float64
+    #If given, known_lower_breakpoints and known_upper_breakpoints are the breakpoints computed beforehand by the caller (they are not modified)
     
     #Initialization
     num_var = len(objective_par)
-    lower_breakpoints = [lower_bound[j]/objective_par[j] for j in range(0,num_var)]
-    upper_breakpoints = [upper_bound[j]/objective_par[j] for j in range(0,num_var)] 
-    current_breakpoints = lower_breakpoints + upper_breakpoints
-    num_current_breakpoints = 2*num_var
-    undecided_variables_indices = [j for j in range(0,num_var)]
+    if known_lower_breakpoints is not None:
+        lower_breakpoints = known_lower_breakpoints
+        upper_breakpoints = known_upper_breakpoints
+    else:
+        lower_breakpoints = numpy.empty(num_var, dtype=breakpoint_dtype)
+        upper_breakpoints = numpy.empty(num_var, dtype=breakpoint_dtype)
+        if inv_par is None:
+            for j in range(0,num_var):
+                lower_breakpoints[j] = lower_bound[j]/objective_par[j]
+                upper_breakpoints[j] = upper_bound[j]/objective_par[j]
+        else:
+            for j in range(0,num_var):
+                lower_breakpoints[j] = lower_bound[j]*inv_par[j]
+                upper_breakpoints[j] = upper_bound[j]*inv_par[j]
+    #The current breakpoints are the window current_breakpoints[breakpoints_start:breakpoints_end]
+    current_breakpoints = numpy.concatenate((lower_breakpoints, upper_breakpoints))
+    breakpoints_start = 0
+    breakpoints_end = 2*num_var
+    undecided_variables_indices = numpy.arange(num_var)
     num_undecided_variables = num_var
-    lower_breakpoint_bound = min(current_breakpoints)
+    lower_breakpoint_bound = current_breakpoints.min()
     upper_breakpoint_bound = math.inf
-    fixed = 0
-    free = 0
+    fixed = 0.0
+    free = 0.0
     
     #Find consecutive breakpoints
-    while num_undecided_variables > 0 and num_current_breakpoints > 0:
+    while num_undecided_variables > 0 and breakpoints_start < breakpoints_end:
         #Find median breakpoint
-        candidate_breakpoint = statistics.median(current_breakpoints)
+        median_position = (breakpoints_start + breakpoints_end)//2
+        candidate_breakpoint, equal_start, equal_end = _select(current_breakpoints, breakpoints_start, breakpoints_end, median_position)
         
         #Compute candidate sum:
-        SummedVariables = 0
-        for var_index in undecided_variables_indices:
+        SummedVariables = 0.0
+        for i in range(0,num_undecided_variables):
+            var_index = undecided_variables_indices[i]
             if upper_breakpoints[var_index] <= candidate_breakpoint:
                 SummedVariables += upper_bound[var_index]
             elif lower_breakpoints[var_index] >= candidate_breakpoint:
@@ -53,81 +121,176 @@ def QRAP_median(objective_par,lower_bound,upper_bound,resource_value):
         SummedVariables += fixed + free*candidate_breakpoint
         
         #Determine relation between variable sum and resource value
-        if abs(SummedVariables - resource_value) <= 10**(-6):
-            opt_multiplier = candidate_breakpoint
-            result = [max(lower_bound[j],min(upper_bound[j],objective_par[j]*opt_multiplier)) for j in range(0,num_var)]
-            return result 
+        if -_EPS <= SummedVariables - resource_value <= _EPS:
+            return candidate_breakpoint
         elif SummedVariables > resource_value:
+            #Keep the breakpoints smaller than the candidate, which _select already moved to the front of the window
             upper_breakpoint_bound = candidate_breakpoint
-            current_breakpoints = [BP for BP in current_breakpoints if BP < candidate_breakpoint]
-            num_current_breakpoints = len(current_breakpoints)
+            breakpoints_end = equal_start
         else:
+            #Keep the breakpoints larger than the candidate, which _select already moved to the back of the window
             lower_breakpoint_bound = candidate_breakpoint
-            current_breakpoints = [BP for BP in current_breakpoints if BP > candidate_breakpoint]
-            num_current_breakpoints = len(current_breakpoints)
+            breakpoints_start = equal_end
         
-        #Determine value of newly decided variables
-        new_undecided_variables = []
-        for var_index in undecided_variables_indices:
+        #Determine value of newly decided variables and compact the remaining undecided ones in place
+        num_kept_variables = 0
+        for i in range(0,num_undecided_variables):
+            var_index = undecided_variables_indices[i]
             if upper_breakpoints[var_index] <= lower_breakpoint_bound:
                 fixed += upper_bound[var_index]
-                num_undecided_variables -= 1
             elif lower_breakpoints[var_index] <= lower_breakpoint_bound and upper_breakpoint_bound <= upper_breakpoints[var_index]:
                 free += objective_par[var_index]
-                num_undecided_variables -= 1
             elif lower_breakpoints[var_index] >= upper_breakpoint_bound:
                 fixed += lower_bound[var_index]
-                num_undecided_variables -= 1
             else:
-                new_undecided_variables.append(var_index)
-        undecided_variables_indices = new_undecided_variables
+                undecided_variables_indices[num_kept_variables] = var_index
+                num_kept_variables += 1
+        num_undecided_variables = num_kept_variables
     
     #Compute optimal multiplier
     if free == 0:
-        opt_multiplier = lower_breakpoint_bound
+        return lower_breakpoint_bound
     else:
-        opt_multiplier = (resource_value - fixed)/free
-        
-    result = [max(lower_bound[j],min(upper_bound[j],objective_par[j]*opt_multiplier)) for j in range(0,num_var)]
-    return result  
+        return (resource_value - fixed)/free
 
 
 
-def QRAP_NC_decomposition(objective_par,lower_bound,upper_bound,lower_nested,upper_nested):
-    #Solves QRAP_NC using the algorithm from Vidal et al. (2019)
+@njit(cache=True)
+def _QRAP_median_solve(objective_par,lower_bound,upper_bound,resource_value,result,inv_par=None,breakpoint_dtype=numpy.float64,known_lower_breakpoints=None,known_upper_breakpoints=None):
+    #Solve an instance of QRAP using a median-find approach and write the solution into result
+    num_var = len(objective_par)
+    
+    #Fast exits: a single variable, or a resource value at (or within tolerance of) the sum of the lower or upper bounds
+    if num_var == 1:
+        result[0] = max(lower_bound[0],min(upper_bound[0],resource_value))
+        return
+    sum_lower = 0.0
+    sum_upper = 0.0
+    for j in range(0,num_var):
+        sum_lower += lower_bound[j]
+        sum_upper += upper_bound[j]
+    if resource_value <= sum_lower + _EPS:
+        result[:] = lower_bound
+        return
+    if resource_value >= sum_upper - _EPS:
+        result[:] = upper_bound
+        return
     
-    #Define decomposition function MDA
+    opt_multiplier = _QRAP_median_multiplier(objective_par, lower_bound, upper_bound, resource_value, inv_par, breakpoint_dtype, known_lower_breakpoints, known_upper_breakpoints)
+    for j in range(0,num_var):
+        result[j] = max(lower_bound[j],min(upper_bound[j],objective_par[j]*opt_multiplier))
+
+
+
+def QRAP_median(objective_par,lower_bound,upper_bound,resource_value,inv_par=None,low_precision_bp=False,out=None):
+    #Solve an instance of QRAP using a meidan-find approach
+    #inv_par (optional): precomputed reciprocals 1/objective_par, for callers that solve many instances with the same objective parameters
+    #low_precision_bp (optional): store the breakpoints in float32; for large instances where a multiplier accurate up to float32 rounding suffices
+    #out (optional): float64 array of length num_var into which the solution is written (and which is returned), instead of a newly allocated one
+    objective_par = numpy.ascontiguousarray(objective_par, dtype=numpy.float64)
+    lower_bound = numpy.ascontiguousarray(lower_bound, dtype=numpy.float64)
+    upper_bound = numpy.ascontiguousarray(upper_bound, dtype=numpy.float64)
+    if inv_par is not None:
+        inv_par = numpy.ascontiguousarray(inv_par, dtype=numpy.float64)
     num_var = len(objective_par)
-    result = numpy.zeros((2,2,num_var))
+    _check_lengths(num_var, lower_bound, upper_bound)
+    if inv_par is not None:
+        _check_lengths(num_var, inv_par)
     
-    def MDA(start_index,end_index,result):
+    if low_precision_bp:
+        breakpoint_dtype = numpy.float32
+    else:
+        breakpoint_dtype = numpy.float64
+    if out is None:
+        result = numpy.zeros(num_var, dtype=numpy.float64)
+    else:
+        #The compiled kernel writes into out without bounds or type checks
+        if not isinstance(out, numpy.ndarray) or out.dtype != numpy.float64 or out.shape != (num_var,):
+            raise ValueError("out must be a float64 array of shape (%d,)" % num_var)
+        result = out
+    _QRAP_median_solve(objective_par, lower_bound, upper_bound, float(resource_value), result, inv_par, breakpoint_dtype)
+    return result  
+
+
 
+@njit(cache=True, error_model='numpy')
+def _QRAP_NC_decomposition_kernel(objective_par,lower_bound,upper_bound,lower_nested,upper_nested,result):
+    #Decomposition steps of the algorithm from Vidal et al. (2019)
+    num_var = len(objective_par)
+    
+    #Reciprocals of the objective parameters, shared by all QRAP subproblems
+    inv_par = 1.0/objective_par
+    
+    #Preallocate one scratch buffer for the variable bounds of the subproblems (rows: current lower, current upper, alternative lower, alternative upper)
+    bounds_buffer = numpy.zeros((4,num_var))
+    current_lower_bounds = bounds_buffer[0]
+    current_upper_bounds = bounds_buffer[1]
+    alternative_lower_bounds = bounds_buffer[2]
+    alternative_upper_bounds = bounds_buffer[3]
+    
+    #Determine the segments of the decomposition in depth-first order (right subsegment first), such that the reversed order is a post-order traversal
+    #In the post-order, a segment is processed directly after its subsegments, while their results are still in cache
+    stack_size = 1
+    width = num_var
+    while width > 1:
+        width = (width + 1)//2
+        stack_size += 1
+    stack = numpy.zeros((stack_size,2), dtype=numpy.int64)
+    stack[0,1] = num_var - 1
+    num_stack = 1
+    segments = numpy.zeros((2*num_var - 1,2), dtype=numpy.int64)
+    num_segments = 0
+    while num_stack > 0:
+        num_stack -= 1
+        start_index = stack[num_stack,0]
+        end_index = stack[num_stack,1]
+        segments[num_segments,0] = start_index
+        segments[num_segments,1] = end_index
+        num_segments += 1
+        if start_index != end_index:
+            new_index = (start_index + end_index)//2
+            stack[num_stack,0] = start_index
+            stack[num_stack,1] = new_index
+            stack[num_stack + 1,0] = new_index + 1
+            stack[num_stack + 1,1] = end_index
+            num_stack += 2
+    
+    #Do decomposition steps bottom-up: all subsegments of a segment are processed before the segment itself
+    for i in range(num_segments - 1,-1,-1):
+        start_index = segments[i,0]
+        end_index = segments[i,1]
         if start_index == end_index:
             #Only one variable!
             #Compute solutions!
             if start_index == 0:
-                result[0][0][start_index] = lower_nested[start_index] 
-                result[0][1][start_index] = upper_nested[start_index] 
-                result[1][0][start_index] = lower_nested[start_index] 
-                result[1][1][start_index] = upper_nested[start_index] 
+                result[0,0,start_index] = lower_nested[start_index] 
+                result[0,1,start_index] = upper_nested[start_index] 
+                result[1,0,start_index] = lower_nested[start_index] 
+                result[1,1,start_index] = upper_nested[start_index] 
             else:
-                result[0][0][start_index] = lower_nested[start_index] - lower_nested[start_index - 1]
-                result[0][1][start_index] = upper_nested[start_index] - lower_nested[start_index - 1]
-                result[1][0][start_index] = lower_nested[start_index] - upper_nested[start_index - 1]
-                result[1][1][start_index] = upper_nested[start_index] - upper_nested[start_index - 1]
-        else:
-            new_index = math.floor((start_index + end_index)/2)
-            #Do decomposition steps
-            MDA(start_index,new_index,result)
-            MDA(new_index + 1, end_index,result)
-            option_list = [[0,0],[0,1],[1,0],[1,1]]
-            for subcase in option_list:
+                result[0,0,start_index] = lower_nested[start_index] - lower_nested[start_index - 1]
+                result[0,1,start_index] = upper_nested[start_index] - lower_nested[start_index - 1]
+                result[1,0,start_index] = lower_nested[start_index] - upper_nested[start_index - 1]
+                result[1,1,start_index] = upper_nested[start_index] - upper_nested[start_index - 1]
+            continue
+        
+        new_index = (start_index + end_index)//2
+        num_segment_var = end_index + 1 - start_index
+        for subcase_lower in range(0,2):
+            for subcase_upper in range(0,2):
                 #Determine new variable bounds
-                current_lower_bounds = [result[subcase[0]][0][j] for j in range(start_index,new_index + 1)] + [result[1][subcase[1]][j] for j in range(new_index+1,end_index+1)]
-                current_upper_bounds = [result[subcase[0]][1][j] for j in range(start_index,new_index + 1)] + [result[0][subcase[1]][j] for j in range(new_index+1,end_index+1)]
-                alternative_lower_bounds = [0]*(end_index + 1 - start_index)
-                alternative_upper_bounds = [0]*(end_index + 1 - start_index)
-                for j in range(0,end_index + 1 - start_index):
+                sum_lower = 0.0
+                sum_upper = 0.0
+                sum_lower_original = 0.0
+                sum_upper_original = 0.0
+                for j in range(0,num_segment_var):
+                    if j + start_index <= new_index:
+                        current_lower_bounds[j] = result[subcase_lower,0,j + start_index]
+                        current_upper_bounds[j] = result[subcase_lower,1,j + start_index]
+                    else:
+                        current_lower_bounds[j] = result[1,subcase_upper,j + start_index]
+                        current_upper_bounds[j] = result[0,subcase_upper,j + start_index]
+                    
                     if current_upper_bounds[j] < lower_bound[j + start_index]:
                         alternative_lower_bounds[j] = current_upper_bounds[j]
                     elif current_lower_bounds[j] > lower_bound[j + start_index]:
@@ -141,45 +304,219 @@ def QRAP_NC_decomposition(objective_par,lower_bound,upper_bound,lower_nested,upp
                         alternative_upper_bounds[j] = current_upper_bounds[j]
                     else:
                         alternative_upper_bounds[j] = upper_bound[j + start_index]
+                    
+                    sum_lower += alternative_lower_bounds[j]
+                    sum_upper += alternative_upper_bounds[j]
+                    sum_lower_original += current_lower_bounds[j]
+                    sum_upper_original += current_upper_bounds[j]
 
                 #Determine new target resource value
-                if start_index == 0:
-                    if subcase[1] == 0:
-                        target_value = lower_nested[end_index]
-                    else:
-                        target_value = upper_nested[end_index]
+                if subcase_upper == 0:
+                    target_value = lower_nested[end_index]
                 else:
-                    if subcase == [0,0]:
-                        target_value = lower_nested[end_index] - lower_nested[start_index - 1]
-                    elif subcase == [0,1]:
-                        target_value = upper_nested[end_index] - lower_nested[start_index - 1]
-                    elif subcase == [1,0]:
-                        target_value = lower_nested[end_index] - upper_nested[start_index -1]
+                    target_value = upper_nested[end_index]
+                if start_index > 0:
+                    if subcase_lower == 0:
+                        target_value -= lower_nested[start_index - 1]
                     else:
-                        target_value = upper_nested[end_index] - upper_nested[start_index - 1]
+                        target_value -= upper_nested[start_index - 1]
                 
-                sum_lower = sum(alternative_lower_bounds)
-                sum_upper = sum(alternative_upper_bounds)
                 if target_value < sum_lower:
-                    sum_lower_original = sum(current_lower_bounds)      
                     HELP_sum = (target_value - sum_lower)/(sum_lower_original - sum_lower)                  
-                    result[subcase[0]][subcase[1]][start_index:end_index + 1] = [alternative_lower_bounds[j] + HELP_sum*(current_lower_bounds[j] - alternative_lower_bounds[j]) for j in range(0,end_index - start_index +1)]
+                    for j in range(0,num_segment_var):
+                        result[subcase_lower,subcase_upper,j + start_index] = alternative_lower_bounds[j] + HELP_sum*(current_lower_bounds[j] - alternative_lower_bounds[j])
                 elif target_value > sum_upper:
-                    sum_upper_original = sum(current_upper_bounds)
                     HELP_sum = (target_value - sum_upper)/(sum_upper_original - sum_upper)
-                    result[subcase[0]][subcase[1]][start_index:end_index + 1] = [alternative_upper_bounds[j] + HELP_sum*(current_upper_bounds[j] - alternative_upper_bounds[j]) for j in range(0,end_index - start_index+1)]
+                    for j in range(0,num_segment_var):
+                        result[subcase_lower,subcase_upper,j + start_index] = alternative_upper_bounds[j] + HELP_sum*(current_upper_bounds[j] - alternative_upper_bounds[j])
                 else:       
                     #Solve QRAP subproblem
-                    result[subcase[0]][subcase[1]][start_index:end_index + 1] = QRAP_median(objective_par[start_index:end_index+1], alternative_lower_bounds, alternative_upper_bounds, target_value)
-        return result
+                    _QRAP_median_solve(objective_par[start_index:end_index + 1], alternative_lower_bounds[0:num_segment_var], alternative_upper_bounds[0:num_segment_var], target_value, result[subcase_lower,subcase_upper,start_index:end_index + 1], inv_par[start_index:end_index + 1])
+
+
+
+def QRAP_NC_decomposition(objective_par,lower_bound,upper_bound,lower_nested,upper_nested):
+    #Solves QRAP_NC using the algorithm from Vidal et al. (2019)
+    objective_par = numpy.ascontiguousarray(objective_par, dtype=numpy.float64)
+    lower_bound = numpy.ascontiguousarray(lower_bound, dtype=numpy.float64)
+    upper_bound = numpy.ascontiguousarray(upper_bound, dtype=numpy.float64)
+    lower_nested = numpy.ascontiguousarray(lower_nested, dtype=numpy.float64)
+    upper_nested = numpy.ascontiguousarray(upper_nested, dtype=numpy.float64)
+    num_var = len(objective_par)
+    _check_lengths(num_var, lower_bound, upper_bound, lower_nested, upper_nested)
+    result = numpy.zeros((2,2,num_var), dtype=numpy.float64, order='C')
     
-    main_result = MDA(0,num_var-1,result)
-    return main_result[0][1]
+    _QRAP_NC_decomposition_kernel(objective_par, lower_bound, upper_bound, lower_nested, upper_nested, result)
+    return result[0, 1]
 
 
     
-def QRAP_NC_seq(objective_par,lower_bound,upper_bound,lower_nested,upper_nested):
-    #Solves QRAP-NC using approach of Schoot Uiterkamp et al. (2020)
+@njit(cache=True)
+def _tighten_nested_bounds(lower_bound,upper_bound,lower_nested,upper_nested):
+    #Tighten the nested bounds (in place) such that lower_nested[j] >= lower_nested[j-1] + lower_bound[j] and upper_nested[j] <= upper_nested[j-1] + upper_bound[j]
+    #This is a sequential recursion; the tightened values are reused in exact comparisons later on, so they are computed exactly as the plain recursion does
+    for j in range(1,len(lower_bound)):
+        if lower_nested[j-1] + lower_bound[j] > lower_nested[j]:
+            lower_nested[j] = lower_nested[j-1] + lower_bound[j]
+        if upper_nested[j-1] + upper_bound[j] < upper_nested[j]:
+            upper_nested[j] = upper_nested[j-1] + upper_bound[j]
+
+
+
+@njit(cache=True)
+def _heap_less(heap_values,heap_keys,first,second):
+    #Compare heap entries by value, ties are broken by key
+    if heap_values[first] != heap_values[second]:
+        return heap_values[first] < heap_values[second]
+    return heap_keys[first] < heap_keys[second]
+
+
+
+@njit(cache=True)
+def _heap_swap(heap_values,heap_keys,first,second):
+    HELP_value = heap_values[first]
+    heap_values[first] = heap_values[second]
+    heap_values[second] = HELP_value
+    HELP_key = heap_keys[first]
+    heap_keys[first] = heap_keys[second]
+    heap_keys[second] = HELP_key
+
+
+
+@njit(cache=True)
+def _heap_on_min_level(position):
+    #In a min-max heap, entries at even depth are smaller than their descendants and entries at odd depth are larger than their descendants
+    depth = 0
+    position += 1
+    while position > 1:
+        position //= 2
+        depth += 1
+    return depth % 2 == 0
+
+
+
+@njit(cache=True)
+def _heap_bubble_up(heap_values,heap_keys,position,FLAG_min):
+    #Move the entry at position up along its grandparents on the min levels (FLAG_min) or max levels
+    while position > 2:
+        grandparent = ((position - 1)//2 - 1)//2
+        if FLAG_min:
+            FLAG_swap = _heap_less(heap_values, heap_keys, position, grandparent)
+        else:
+            FLAG_swap = _heap_less(heap_values, heap_keys, grandparent, position)
+        if not FLAG_swap:
+            break
+        _heap_swap(heap_values, heap_keys, position, grandparent)
+        position = grandparent
+
+
+
+@njit(cache=True)
+def _heap_push(heap_values,heap_keys,heap_size,value,key):
+    #Push the entry (value, key) onto the min-max heap stored in heap_values[0:heap_size], heap_keys[0:heap_size] and return the new heap size
+    heap_values[heap_size] = value
+    heap_keys[heap_size] = key
+    position = heap_size
+    if position > 0:
+        parent = (position - 1)//2
+        if _heap_on_min_level(position):
+            if _heap_less(heap_values, heap_keys, parent, position):
+                _heap_swap(heap_values, heap_keys, position, parent)
+                _heap_bubble_up(heap_values, heap_keys, parent, False)
+            else:
+                _heap_bubble_up(heap_values, heap_keys, position, True)
+        else:
+            if _heap_less(heap_values, heap_keys, position, parent):
+                _heap_swap(heap_values, heap_keys, position, parent)
+                _heap_bubble_up(heap_values, heap_keys, parent, True)
+            else:
+                _heap_bubble_up(heap_values, heap_keys, position, False)
+    return heap_size + 1
+
+
+
+@njit(cache=True)
+def _heap_max_position(heap_values,heap_keys,heap_size):
+    #Position of the largest entry of the (non-empty) min-max heap: the root or one of its children
+    if heap_size == 1:
+        return 0
+    if heap_size > 2 and _heap_less(heap_values, heap_keys, 1, 2):
+        return 2
+    return 1
+
+
+
+@njit(cache=True)
+def _heap_remove(heap_values,heap_keys,heap_size,position):
+    #Remove the entry at position (the root or the position of the largest entry) of the min-max heap and return the new heap size
+    heap_size -= 1
+    heap_values[position] = heap_values[heap_size]
+    heap_keys[position] = heap_keys[heap_size]
+    FLAG_min = _heap_on_min_level(position)
+    while 2*position + 1 < heap_size:
+        #Find the smallest (FLAG_min) or largest entry among the children and grandchildren
+        best = 2*position + 1
+        for descendant in (2*position + 2, 4*position + 3, 4*position + 4, 4*position + 5, 4*position + 6):
+            if descendant < heap_size:
+                if FLAG_min:
+                    FLAG_better = _heap_less(heap_values, heap_keys, descendant, best)
+                else:
+                    FLAG_better = _heap_less(heap_values, heap_keys, best, descendant)
+                if FLAG_better:
+                    best = descendant
+        if FLAG_min:
+            FLAG_swap = _heap_less(heap_values, heap_keys, best, position)
+        else:
+            FLAG_swap = _heap_less(heap_values, heap_keys, position, best)
+        if not FLAG_swap:
+            break
+        _heap_swap(heap_values, heap_keys, best, position)
+        if best < 4*position + 3:
+            break
+        #best is a grandchild: restore the order with respect to its parent on the opposite level
+        parent = (best - 1)//2
+        if FLAG_min:
+            FLAG_swap = _heap_less(heap_values, heap_keys, parent, best)
+        else:
+            FLAG_swap = _heap_less(heap_values, heap_keys, best, parent)
+        if FLAG_swap:
+            _heap_swap(heap_values, heap_keys, best, parent)
+        position = best
+    return heap_size
+
+
+
+@njit(cache=True)
+def _QRAP_NC_seq_backward_sweep(objective_par,lower_bound,upper_bound,lower_opt_multiplier,upper_opt_multiplier):
+    #Backward sweep of QRAP_NC_seq: compute the intermediate multipliers and the optimal solutions of the lower and upper problems from the optimal multipliers
+    num_var = len(objective_par)
+
+    #Intermediate multiplier values (chi) of the current variable; only the value of the next variable is needed, so they are kept as scalars
+    lower_opt_multiplier_new = lower_opt_multiplier[num_var-1]
+    upper_opt_multiplier_new = upper_opt_multiplier[num_var-1]
+    
+    #Initialize placeholders for optimal solutions   
+    opt_lower = numpy.zeros(num_var, dtype=numpy.float64)
+    opt_upper = numpy.zeros(num_var, dtype=numpy.float64)
+    opt_lower[num_var-1] = max(lower_bound[num_var-1],min(upper_bound[num_var-1],objective_par[num_var-1]*lower_opt_multiplier_new))               
+    opt_upper[num_var-1] = max(lower_bound[num_var-1],min(upper_bound[num_var-1],objective_par[num_var-1]*upper_opt_multiplier_new))
+    
+    #Compute intermediate multiplier values 
+    #Clamp with min/max and conditional expressions instead of if/elif chains, such that the loop compiles to branchless selects and minsd/maxsd instructions
+    #The argument order keeps the priorities of the chains: the upper multiplier wins if the multipliers cross, and nan propagates
+    for j in range(num_var - 2,-1,-1):
+        lower_opt_multiplier_new = upper_opt_multiplier[j] if upper_opt_multiplier[j] <= lower_opt_multiplier_new else max(lower_opt_multiplier_new,lower_opt_multiplier[j])
+        upper_opt_multiplier_new = upper_opt_multiplier[j] if upper_opt_multiplier[j] <= upper_opt_multiplier_new else max(upper_opt_multiplier_new,lower_opt_multiplier[j])
+        opt_lower[j] = max(min(objective_par[j]*lower_opt_multiplier_new,upper_bound[j]),lower_bound[j])
+        opt_upper[j] = max(min(objective_par[j]*upper_opt_multiplier_new,upper_bound[j]),lower_bound[j])
+
+    return opt_lower, opt_upper
+
+
+
+@njit(cache=True)
+def _QRAP_NC_seq_kernel(objective_par,lower_bound,upper_bound,lower_nested,upper_nested):
+    #Sequential procedures of the approach of Schoot Uiterkamp et al. (2020); modifies the bounds in place
     
     #Initialization of parameters:
     num_var = len(objective_par)      
@@ -187,43 +524,45 @@ def QRAP_NC_seq(objective_par,lower_bound,upper_bound,lower_nested,upper_nested)
     upper_nested[0] = min(upper_nested[0],upper_bound[0])
     lower_bound[0] = max(lower_nested[0],lower_bound[0])
     upper_bound[0] = min(upper_nested[0],upper_bound[0])
-    for j in range(1,num_var):
-        if lower_nested[j-1] + lower_bound[j] > lower_nested[j]:
-           lower_nested[j] = lower_nested[j-1] + lower_bound[j]
-        if upper_nested[j-1] + upper_bound[j] < upper_nested[j]:
-            upper_nested[j] = upper_nested[j-1] + upper_bound[j]
+    _tighten_nested_bounds(lower_bound, upper_bound, lower_nested, upper_nested)
     
     #Initialization of breakpoints
-    lower_breakpoints = [lower_bound[j]/objective_par[j] for j in range(0,num_var)]
-    upper_breakpoints = [upper_bound[j]/objective_par[j] for j in range(0,num_var)]    
+    lower_breakpoints = lower_bound/objective_par
+    upper_breakpoints = upper_bound/objective_par
     
     #Initialization of optimal multiplier lists
-    lower_opt_multiplier = [0]*num_var
-    upper_opt_multiplier = [0]*num_var
+    lower_opt_multiplier = numpy.zeros(num_var, dtype=numpy.float64)
+    upper_opt_multiplier = numpy.zeros(num_var, dtype=numpy.float64)
     lower_opt_multiplier[0] = lower_breakpoints[0]
     upper_opt_multiplier[0] = upper_breakpoints[0]
     
     #Initialization of multiplier heaps (breakpoint sets to be updated throughout the algorithm)
-    lower_breakpoints_heap_min = []
-    upper_breakpoints_heap_min = []
-    lower_breakpoints_heap_max = []
-    upper_breakpoints_heap_max = []
-    num_lower_breakpoints_heap = 0
-    num_upper_breakpoints_heap = 0
-    lower_opt_multiplier_deque = deque([0])
-    num_lower_opt_multiplier_deque = 1
-    upper_opt_multiplier_deque = deque([0])
-    num_upper_opt_multiplier_deque = 1
+    #Lower and upper initial breakpoints share one min-max heap, stored as parallel value and key arrays
+    #The key of the breakpoint of type 1 (lower) or 2 (upper) of variable j is (type - 1)*num_var + j, so that ties in value are broken by type first and index second
+    #Each variable adds at most one breakpoint of each type, so 2*num_var entries suffice
+    breakpoints_heap_values = numpy.zeros(2*num_var, dtype=numpy.float64)
+    breakpoints_heap_keys = numpy.zeros(2*num_var, dtype=numpy.int64)
+    num_breakpoints_heap = 0
     
-    #Initialize flag paramters
-    Removed_lower_BP = [0]*num_var
-    Removed_upper_BP = [0]*num_var
+    #Initialization of multiplier deques as ring buffers: the deque holds the entries buffer[i & deque_mask] for head <= i < tail, so it is empty if head == tail
+    #head and tail are not wrapped themselves (head may become negative); only the buffer positions are
+    #The capacity is a power of two (at least num_var + 1), so that wrapping around is a bit mask instead of a modulo
+    deque_capacity = 1
+    while deque_capacity < num_var + 1:
+        deque_capacity *= 2
+    deque_mask = deque_capacity - 1
+    lower_opt_multiplier_deque = numpy.zeros(deque_capacity, dtype=numpy.int64)
+    lower_deque_head = 0
+    lower_deque_tail = 1
+    upper_opt_multiplier_deque = numpy.zeros(deque_capacity, dtype=numpy.int64)
+    upper_deque_head = 0
+    upper_deque_tail = 1
     
     #Initialize bookkeeping parameters
-    lower_fixed = [0]*num_var
-    upper_fixed = [0]*num_var
-    lower_free = [0]*num_var
-    upper_free = [0]*num_var   
+    lower_fixed = numpy.zeros(num_var, dtype=numpy.float64)
+    upper_fixed = numpy.zeros(num_var, dtype=numpy.float64)
+    lower_free = numpy.zeros(num_var, dtype=numpy.float64)
+    upper_free = numpy.zeros(num_var, dtype=numpy.float64)   
     lower_free[0] = objective_par[0]
     upper_free[0] = objective_par[0]
     
@@ -238,9 +577,9 @@ def QRAP_NC_seq(objective_par,lower_bound,upper_bound,lower_nested,upper_nested)
         Help_par = lower_nested[j-1] + max(lower_bound[j],min(upper_bound[j],objective_par[j]*lower_opt_multiplier[j-1]))
         if Help_par == lower_nested[j]:
             lower_opt_multiplier[j] = lower_opt_multiplier[j-1]
-            if num_lower_opt_multiplier_deque > 0:
-                if lower_opt_multiplier_deque[0] == j-1:
-                    lower_opt_multiplier_deque[0] = j
+            if lower_deque_tail > lower_deque_head:
+                if lower_opt_multiplier_deque[lower_deque_head & deque_mask] == j-1:
+                    lower_opt_multiplier_deque[lower_deque_head & deque_mask] = j
             lower_fixed[j] = lower_fixed[j-1]
             lower_free[j] = lower_free[j-1]
             if lower_opt_multiplier[j] < lower_breakpoints[j]:
@@ -253,14 +592,13 @@ def QRAP_NC_seq(objective_par,lower_bound,upper_bound,lower_nested,upper_nested)
             lower_opt_multiplier[j] = (lower_nested[j] - lower_nested[j-1])/objective_par[j]
             lower_fixed[j] = lower_nested[j-1]
             lower_free[j] = objective_par[j]
-            lower_opt_multiplier_deque.appendleft(j)
-            num_lower_opt_multiplier_deque += 1
+            lower_deque_head -= 1
+            lower_opt_multiplier_deque[lower_deque_head & deque_mask] = j
         else:
             FLAG_lower = 1
-            if num_lower_opt_multiplier_deque > 0:
-                if lower_opt_multiplier_deque[0] == j-1:
-                    lower_opt_multiplier_deque.popleft()
-                    num_lower_opt_multiplier_deque -= 1
+            if lower_deque_tail > lower_deque_head:
+                if lower_opt_multiplier_deque[lower_deque_head & deque_mask] == j-1:
+                    lower_deque_head += 1
             lower_fixed_help = lower_fixed[j-1]
             lower_free_help = lower_free[j-1]
         
@@ -268,9 +606,9 @@ def QRAP_NC_seq(objective_par,lower_bound,upper_bound,lower_nested,upper_nested)
         Help_par = upper_nested[j-1] + max(lower_bound[j],min(upper_bound[j],objective_par[j]*upper_opt_multiplier[j-1]))
         if Help_par == upper_nested[j]:
             upper_opt_multiplier[j] = upper_opt_multiplier[j-1]
-            if num_upper_opt_multiplier_deque > 0:
-                if upper_opt_multiplier_deque[num_upper_opt_multiplier_deque - 1] == j-1:
-                    upper_opt_multiplier_deque[num_upper_opt_multiplier_deque - 1] = j
+            if upper_deque_tail > upper_deque_head:
+                if upper_opt_multiplier_deque[(upper_deque_tail - 1) & deque_mask] == j-1:
+                    upper_opt_multiplier_deque[(upper_deque_tail - 1) & deque_mask] = j
             upper_fixed[j] = upper_fixed[j-1]
             upper_free[j] = upper_free[j-1]
             if upper_opt_multiplier[j] > upper_breakpoints[j]:
@@ -283,14 +621,13 @@ def QRAP_NC_seq(objective_par,lower_bound,upper_bound,lower_nested,upper_nested)
             upper_opt_multiplier[j] = (upper_nested[j] - upper_nested[j-1])/objective_par[j]
             upper_fixed[j] = upper_nested[j-1]
             upper_free[j] = objective_par[j]
-            upper_opt_multiplier_deque.append(j)
-            num_upper_opt_multiplier_deque += 1
+            upper_opt_multiplier_deque[upper_deque_tail & deque_mask] = j
+            upper_deque_tail += 1
         else:
             FLAG_upper = 1
-            if num_upper_opt_multiplier_deque > 0:
-                if upper_opt_multiplier_deque[num_upper_opt_multiplier_deque - 1] == j-1:
-                    upper_opt_multiplier_deque.pop()
-                    num_upper_opt_multiplier_deque -= 1
+            if upper_deque_tail > upper_deque_head:
+                if upper_opt_multiplier_deque[(upper_deque_tail - 1) & deque_mask] == j-1:
+                    upper_deque_tail -= 1
             upper_fixed_help = upper_fixed[j-1]
             upper_free_help = upper_free[j-1]
 
@@ -305,14 +642,10 @@ def QRAP_NC_seq(objective_par,lower_bound,upper_bound,lower_nested,upper_nested)
         else:
             Threshold_upper = upper_opt_multiplier[j-1]
 
-        if Threshold_lower < lower_breakpoints[j] - 10**(-6) and lower_breakpoints[j] <= Threshold_upper - 10**(-6):
-            num_lower_breakpoints_heap +=1
-            heapq.heappush(lower_breakpoints_heap_min, [lower_breakpoints[j],j])
-            heapq.heappush(lower_breakpoints_heap_max, [-lower_breakpoints[j],j])
-        if Threshold_lower <= upper_breakpoints[j] - 10**(-6) and upper_breakpoints[j] < Threshold_upper - 10**(-6):
-            num_upper_breakpoints_heap += 1
-            heapq.heappush(upper_breakpoints_heap_min, [upper_breakpoints[j],j])
-            heapq.heappush(upper_breakpoints_heap_max, [-upper_breakpoints[j],j])
+        if Threshold_lower < lower_breakpoints[j] - _EPS and lower_breakpoints[j] <= Threshold_upper - _EPS:
+            num_breakpoints_heap = _heap_push(breakpoints_heap_values, breakpoints_heap_keys, num_breakpoints_heap, lower_breakpoints[j], j)
+        if Threshold_lower <= upper_breakpoints[j] - _EPS and upper_breakpoints[j] < Threshold_upper - _EPS:
+            num_breakpoints_heap = _heap_push(breakpoints_heap_values, breakpoints_heap_keys, num_breakpoints_heap, upper_breakpoints[j], num_var + j)
 
         #If required: prepare for breakpoint search for the lower subproblem
         if FLAG_lower == 1:
@@ -329,43 +662,22 @@ def QRAP_NC_seq(objective_par,lower_bound,upper_bound,lower_nested,upper_nested)
             while FLAG_found == 0:
                 #Determine next candidate breakpoint
                 current_minimum_value = math.inf
-                if num_lower_breakpoints_heap > 0:
-                    FLAG_find_01 = 0
-                    while FLAG_find_01 == 0:
-                        candidate = lower_breakpoints_heap_min[0]
-                        if Removed_lower_BP[candidate[1]] == 1:
-                            heapq.heappop(lower_breakpoints_heap_min)
-                        else:
-                            candidate_breakpoint_index = candidate[1]
-                            candidate_breakpoint_value = candidate[0]
-                            FLAG_find_01 = 1                        
+                if num_breakpoints_heap > 0:
+                    candidate_breakpoint_index = breakpoints_heap_keys[0] % num_var
+                    candidate_breakpoint_value = breakpoints_heap_values[0]
                     if candidate_breakpoint_value < current_minimum_value:
                         current_minimum_value = candidate_breakpoint_value
                         current_index = candidate_breakpoint_index
-                        Type_next_breakpoint = 1
-                if num_upper_breakpoints_heap > 0:
-                    FLAG_find_01 = 0
-                    while FLAG_find_01 == 0:
-                        candidate = upper_breakpoints_heap_min[0]
-                        if Removed_upper_BP[candidate[1]] == 1:
-                            heapq.heappop(upper_breakpoints_heap_min)
-                        else:
-                            candidate_breakpoint_index = candidate[1]
-                            candidate_breakpoint_value = candidate[0]
-                            FLAG_find_01 = 1
-                    if candidate_breakpoint_value < current_minimum_value:
-                        current_minimum_value = candidate_breakpoint_value
-                        current_index = candidate_breakpoint_index
-                        Type_next_breakpoint = 2                    
-                if num_lower_opt_multiplier_deque > 0:
-                    candidate_breakpoint_index = lower_opt_multiplier_deque[0]
+                        Type_next_breakpoint = breakpoints_heap_keys[0]//num_var + 1
+                if lower_deque_tail > lower_deque_head:
+                    candidate_breakpoint_index = lower_opt_multiplier_deque[lower_deque_head & deque_mask]
                     candidate_breakpoint_value = lower_opt_multiplier[candidate_breakpoint_index]
                     if candidate_breakpoint_value < current_minimum_value:
                         current_minimum_value = candidate_breakpoint_value
                         current_index = candidate_breakpoint_index
                         Type_next_breakpoint = 3                
-                if num_upper_opt_multiplier_deque > 0:
-                    candidate_breakpoint_index = upper_opt_multiplier_deque[0]
+                if upper_deque_tail > upper_deque_head:
+                    candidate_breakpoint_index = upper_opt_multiplier_deque[upper_deque_head & deque_mask]
                     candidate_breakpoint_value = upper_opt_multiplier[candidate_breakpoint_index]
                     if candidate_breakpoint_value < current_minimum_value:
                         current_minimum_value = candidate_breakpoint_value
@@ -380,16 +692,16 @@ def QRAP_NC_seq(objective_par,lower_bound,upper_bound,lower_nested,upper_nested)
                     lower_opt_multiplier[j] = (lower_nested[j] - lower_fixed_help)/lower_free_help
                     lower_fixed[j] = lower_fixed_help
                     lower_free[j] = lower_free_help
-                    lower_opt_multiplier_deque.appendleft(j)
-                    num_lower_opt_multiplier_deque += 1
+                    lower_deque_head -= 1
+                    lower_opt_multiplier_deque[lower_deque_head & deque_mask] = j
                     FLAG_found = 1
                 else:
                     candidate_breakpoint_index = current_index
                     Summed_variables = lower_fixed_help + lower_free_help*candidate_breakpoint
-                    if abs(Summed_variables - lower_nested[j]) <= 10**(-6):
+                    if -_EPS <= Summed_variables - lower_nested[j] <= _EPS:
                         lower_opt_multiplier[j] = candidate_breakpoint
-                        lower_opt_multiplier_deque.appendleft(j)
-                        num_lower_opt_multiplier_deque += 1
+                        lower_deque_head -= 1
+                        lower_opt_multiplier_deque[lower_deque_head & deque_mask] = j
                         FLAG_found = 1
                         lower_fixed[j] = lower_fixed_help
                         lower_free[j] = lower_free_help
@@ -397,8 +709,8 @@ def QRAP_NC_seq(objective_par,lower_bound,upper_bound,lower_nested,upper_nested)
                         lower_opt_multiplier[j] = (lower_nested[j] - lower_fixed_help)/lower_free_help
                         lower_fixed[j] = lower_fixed_help
                         lower_free[j] = lower_free_help
-                        lower_opt_multiplier_deque.appendleft(j)
-                        num_lower_opt_multiplier_deque += 1
+                        lower_deque_head -= 1
+                        lower_opt_multiplier_deque[lower_deque_head & deque_mask] = j
                         FLAG_found = 1
                     else:
                         #Depending of type of breakpoint: update helper variables and delete breakpoint from corresponding heap or deque:
@@ -406,28 +718,22 @@ def QRAP_NC_seq(objective_par,lower_bound,upper_bound,lower_nested,upper_nested)
                             #Lower initial breakpoint
                             lower_fixed_help -= lower_bound[candidate_breakpoint_index]
                             lower_free_help += objective_par[candidate_breakpoint_index]
-                            Removed_lower_BP[candidate_breakpoint_index] = 1
-                            heapq.heappop(lower_breakpoints_heap_min)
-                            num_lower_breakpoints_heap -= 1                                                                                               
+                            num_breakpoints_heap = _heap_remove(breakpoints_heap_values, breakpoints_heap_keys, num_breakpoints_heap, 0)                                                                                               
                         elif Type_next_breakpoint == 2:
                             #Upper initial breakpoint
                             lower_fixed_help += upper_bound[candidate_breakpoint_index]
                             lower_free_help -= objective_par[candidate_breakpoint_index]   
-                            Removed_upper_BP[candidate_breakpoint_index] = 1
-                            heapq.heappop(upper_breakpoints_heap_min)
-                            num_upper_breakpoints_heap -= 1                    
+                            num_breakpoints_heap = _heap_remove(breakpoints_heap_values, breakpoints_heap_keys, num_breakpoints_heap, 0)                    
                         elif Type_next_breakpoint == 3:
                             #lower optimal multiplier breakpoint
                             lower_fixed_help -= lower_free[candidate_breakpoint_index]*candidate_breakpoint
                             lower_free_help += lower_free[candidate_breakpoint_index]
-                            lower_opt_multiplier_deque.popleft()
-                            num_lower_opt_multiplier_deque -= 1
+                            lower_deque_head += 1
                         else:
                             #Upper optimal multiplier breakpoint
                             lower_fixed_help += upper_free[candidate_breakpoint_index]*candidate_breakpoint
                             lower_free_help -= upper_free[candidate_breakpoint_index]
-                            upper_opt_multiplier_deque.popleft()
-                            num_upper_opt_multiplier_deque -= 1
+                            upper_deque_head += 1
         
         #If required: prepare for breakpoint search for upper subproblem
         if FLAG_upper == 1:
@@ -444,43 +750,23 @@ def QRAP_NC_seq(objective_par,lower_bound,upper_bound,lower_nested,upper_nested)
             while FLAG_found == 0:
                 current_maximum_value = -1*math.inf
                 #Determine candidate breakpoint value
-                if num_lower_breakpoints_heap > 0:
-                    FLAG_find_01 = 0
-                    while FLAG_find_01 == 0:
-                        candidate = lower_breakpoints_heap_max[0]
-                        if Removed_lower_BP[candidate[1]] == 1:
-                            heapq.heappop(lower_breakpoints_heap_max)
-                        else:
-                            candidate_breakpoint_index = candidate[1]
-                            candidate_breakpoint_value = -candidate[0]
-                            FLAG_find_01 = 1
-                    if candidate_breakpoint_value > current_maximum_value:
-                        current_maximum_value = candidate_breakpoint_value
-                        current_index = candidate_breakpoint_index
-                        Type_next_breakpoint = 1
-                if num_upper_breakpoints_heap > 0:       
-                    FLAG_find_01 = 0
-                    while FLAG_find_01 == 0:
-                        candidate = upper_breakpoints_heap_max[0]
-                        if Removed_upper_BP[candidate[1]] == 1:
-                            heapq.heappop(upper_breakpoints_heap_max)
-                        else:
-                            candidate_breakpoint_index = candidate[1]
-                            candidate_breakpoint_value = -candidate[0]
-                            FLAG_find_01 = 1
+                if num_breakpoints_heap > 0:
+                    heap_max_position = _heap_max_position(breakpoints_heap_values, breakpoints_heap_keys, num_breakpoints_heap)
+                    candidate_breakpoint_index = breakpoints_heap_keys[heap_max_position] % num_var
+                    candidate_breakpoint_value = breakpoints_heap_values[heap_max_position]
                     if candidate_breakpoint_value > current_maximum_value:
                         current_maximum_value = candidate_breakpoint_value
                         current_index = candidate_breakpoint_index
-                        Type_next_breakpoint = 2                    
-                if num_lower_opt_multiplier_deque > 0:
-                    candidate_breakpoint_index = lower_opt_multiplier_deque[num_lower_opt_multiplier_deque-1]
+                        Type_next_breakpoint = breakpoints_heap_keys[heap_max_position]//num_var + 1
+                if lower_deque_tail > lower_deque_head:
+                    candidate_breakpoint_index = lower_opt_multiplier_deque[(lower_deque_tail - 1) & deque_mask]
                     candidate_breakpoint_value = lower_opt_multiplier[candidate_breakpoint_index]
                     if candidate_breakpoint_value > current_maximum_value:
                         current_maximum_value = candidate_breakpoint_value
                         current_index = candidate_breakpoint_index
                         Type_next_breakpoint = 3                
-                if num_upper_opt_multiplier_deque > 0:
-                    candidate_breakpoint_index = upper_opt_multiplier_deque[num_upper_opt_multiplier_deque - 1]
+                if upper_deque_tail > upper_deque_head:
+                    candidate_breakpoint_index = upper_opt_multiplier_deque[(upper_deque_tail - 1) & deque_mask]
                     candidate_breakpoint_value = upper_opt_multiplier[candidate_breakpoint_index]
                     if candidate_breakpoint_value > current_maximum_value:
                         current_maximum_value = candidate_breakpoint_value
@@ -495,16 +781,16 @@ def QRAP_NC_seq(objective_par,lower_bound,upper_bound,lower_nested,upper_nested)
                     upper_opt_multiplier[j] = (upper_nested[j] - upper_fixed_help)/upper_free_help
                     upper_fixed[j] = upper_fixed_help
                     upper_free[j] = upper_free_help
-                    upper_opt_multiplier_deque.append(j)
-                    num_upper_opt_multiplier_deque += 1
+                    upper_opt_multiplier_deque[upper_deque_tail & deque_mask] = j
+                    upper_deque_tail += 1
                     FLAG_found = 1
                 else:
                     candidate_breakpoint_index = current_index
                     Summed_variables = upper_fixed_help + upper_free_help*candidate_breakpoint
-                    if abs(Summed_variables - upper_nested[j]) <= 10**(-6):
+                    if -_EPS <= Summed_variables - upper_nested[j] <= _EPS:
                         upper_opt_multiplier[j] = candidate_breakpoint
-                        upper_opt_multiplier_deque.append(j)
-                        num_upper_opt_multiplier_deque += 1
+                        upper_opt_multiplier_deque[upper_deque_tail & deque_mask] = j
+                        upper_deque_tail += 1
                         FLAG_found = 1
                         upper_fixed[j] = upper_fixed_help
                         upper_free[j] = upper_free_help
@@ -512,8 +798,8 @@ def QRAP_NC_seq(objective_par,lower_bound,upper_bound,lower_nested,upper_nested)
                         upper_opt_multiplier[j] = (upper_nested[j] - upper_fixed_help)/upper_free_help
                         upper_fixed[j] = upper_fixed_help
                         upper_free[j] = upper_free_help
-                        upper_opt_multiplier_deque.append(j)
-                        num_upper_opt_multiplier_deque += 1
+                        upper_opt_multiplier_deque[upper_deque_tail & deque_mask] = j
+                        upper_deque_tail += 1
                         FLAG_found = 1
                     else:
                         #Depending of type of breakpoint: update helper variables and delete breakpoint from corresponding heap or deque:
@@ -521,133 +807,141 @@ def QRAP_NC_seq(objective_par,lower_bound,upper_bound,lower_nested,upper_nested)
                             #lower initial breakpoint
                             upper_fixed_help += lower_bound[candidate_breakpoint_index]
                             upper_free_help -= objective_par[candidate_breakpoint_index]
-                            Removed_lower_BP[candidate_breakpoint_index] = 1
-                            num_lower_breakpoints_heap -= 1
-                            heapq.heappop(lower_breakpoints_heap_max)                                                                                                      
+                            num_breakpoints_heap = _heap_remove(breakpoints_heap_values, breakpoints_heap_keys, num_breakpoints_heap, heap_max_position)                                                                                                      
                         elif Type_next_breakpoint == 2:
                             #Upper initial breakpoint
                             upper_fixed_help -= upper_bound[candidate_breakpoint_index]
                             upper_free_help += objective_par[candidate_breakpoint_index]
-                            Removed_upper_BP[candidate_breakpoint_index] = 1
-                            num_upper_breakpoints_heap -= 1
-                            heapq.heappop(upper_breakpoints_heap_max)
+                            num_breakpoints_heap = _heap_remove(breakpoints_heap_values, breakpoints_heap_keys, num_breakpoints_heap, heap_max_position)
                         elif Type_next_breakpoint == 3:
                             #lower optimal multiplier breakpoint
                             upper_fixed_help += lower_free[candidate_breakpoint_index]*candidate_breakpoint
                             upper_free_help -= lower_free[candidate_breakpoint_index]
-                            lower_opt_multiplier_deque.pop()
-                            num_lower_opt_multiplier_deque -= 1
+                            lower_deque_tail -= 1
                         else:
                             #upper optimal multiplier breakpoint
                             upper_fixed_help -= upper_free[candidate_breakpoint_index]*candidate_breakpoint
                             upper_free_help += upper_free[candidate_breakpoint_index]
-                            upper_opt_multiplier_deque.pop()
-                            num_upper_opt_multiplier_deque -= 1           
+                            upper_deque_tail -= 1           
 
-    #Initialize placeholders for intermediate multiplier values (chi)
-    lower_opt_multiplier_new = [0]*num_var
-    upper_opt_multiplier_new = [0]*num_var
+    #Compute intermediate multiplier values and the corresponding optimal solutions of the lower and upper problems
+    opt_lower, opt_upper = _QRAP_NC_seq_backward_sweep(objective_par, lower_bound, upper_bound, lower_opt_multiplier, upper_opt_multiplier)
 
-    lower_opt_multiplier_new[num_var-1] = lower_opt_multiplier[num_var-1]
-    upper_opt_multiplier_new[num_var-1] = upper_opt_multiplier[num_var-1]
-    
-    #Initialize placeholders for optimal solutions   
-    opt_lower = [0]*num_var
-    opt_upper = [0]*num_var
-    opt_lower[num_var-1] = max(lower_bound[num_var-1],min(upper_bound[num_var-1],objective_par[num_var-1]*lower_opt_multiplier_new[num_var-1]))               
-    opt_upper[num_var-1] = max(lower_bound[num_var-1],min(upper_bound[num_var-1],objective_par[num_var-1]*upper_opt_multiplier_new[num_var-1]))
-    
-    #Compute intermediate multiplier values 
-    for j in range(num_var - 2,-1,-1):
-        if upper_opt_multiplier[j] <= lower_opt_multiplier_new[j+1]:
-            lower_opt_multiplier_new[j] = upper_opt_multiplier[j]
-        elif lower_opt_multiplier[j] >= lower_opt_multiplier_new[j+1]:
-            lower_opt_multiplier_new[j] = lower_opt_multiplier[j]
-        else:
-            lower_opt_multiplier_new[j] = lower_opt_multiplier_new[j+1]
-            
-        if upper_opt_multiplier[j] <= upper_opt_multiplier_new[j+1]:
-            upper_opt_multiplier_new[j] = upper_opt_multiplier[j]
-        elif lower_opt_multiplier[j] >= upper_opt_multiplier_new[j+1]:
-            upper_opt_multiplier_new[j] = lower_opt_multiplier[j]
-        else:
-            upper_opt_multiplier_new[j] = upper_opt_multiplier_new[j+1]        
-        
-        if lower_bound[j] > objective_par[j]*lower_opt_multiplier_new[j]:
-            opt_lower[j] = lower_bound[j]
-        elif upper_bound[j] < objective_par[j]*lower_opt_multiplier_new[j]:
-            opt_lower[j] = upper_bound[j]
-        else:
-            opt_lower[j] = objective_par[j]*lower_opt_multiplier_new[j]
-
-        if lower_bound[j] > objective_par[j]*upper_opt_multiplier_new[j]:
-            opt_upper[j] = lower_bound[j]
-        elif upper_bound[j] < objective_par[j]*upper_opt_multiplier_new[j]:
-            opt_upper[j] = upper_bound[j]
-        else:
-            opt_upper[j] = objective_par[j]*upper_opt_multiplier_new[j]
-                        
     #Compute optimal solution
     if lower_nested[num_var - 1] == upper_nested[num_var - 1]:
         return opt_lower
     else:
-        opt = [max(opt_lower[j],min(opt_upper[j],objective_par[j]*0)) for j in range(0,num_var)]
-        return opt
+        #The unconstrained minimizer of each variable is 0 (objective_par[j]*0)
+        return numpy.maximum(opt_lower, numpy.minimum(opt_upper, 0.0))
 
 
 
-def QRAP_NC_infeasible(objective_par,lower_bound,upper_bound,lower_nested,upper_nested):
-    #Compute optimal solution to QRAP_NC via infeasibility-guided algorithm of Van der Klauw et al. (2017)
+def QRAP_NC_seq(objective_par,lower_bound,upper_bound,lower_nested,upper_nested):
+    #Solves QRAP-NC using approach of Schoot Uiterkamp et al. (2020)
+    objective_par = numpy.array(objective_par, dtype=numpy.float64)
+    lower_bound = numpy.array(lower_bound, dtype=numpy.float64)
+    upper_bound = numpy.array(upper_bound, dtype=numpy.float64)
+    lower_nested = numpy.array(lower_nested, dtype=numpy.float64)
+    upper_nested = numpy.array(upper_nested, dtype=numpy.float64)
+    _check_lengths(len(objective_par), lower_bound, upper_bound, lower_nested, upper_nested)
+    return _QRAP_NC_seq_kernel(objective_par, lower_bound, upper_bound, lower_nested, upper_nested)
 
-    #Initialize parameters    
-    num_var = len(objective_par)
 
-    lower_nested2 = [lower_nested[i] for i in range(0,num_var)]
-    upper_nested2 = [upper_nested[i] for i in range(0,num_var)]
-    
-    Sol_vec = [0]*num_var
-    HELP_num = 0
-    HELP_num_2 = 0
+
+def _QRAP_NC_infeasible_split(params,nested,breakpoints,start_index,end_index,result,sums_buffer,tolerance):
+    #One step of the infeasibility-guided algorithm of Van der Klauw et al. (2017) for the subproblem of the variables start_index,...,end_index - 1
+    #params holds the rows objective_par, lower_bound, upper_bound, nested the rows lower_nested2, upper_nested2 and breakpoints the rows lower_breakpoints, upper_breakpoints
+    #The nested bounds of the subproblem are lower_nested2[start_index:end_index] and upper_nested2[start_index:end_index]; they are updated in place and the solution of the relaxation is written into result[start_index:end_index]
+    #The breakpoints of all variables are computed once by the caller and shared by all relaxations
+    #sums_buffer is scratch space of length num_var for the partial sums of the relaxations (each step only uses its own range)
+    #Nested constraints are considered violated if they are violated by more than tolerance
+    #Returns the index Max_index of the most violated constraint, such that the subproblems start_index,...,Max_index and Max_index + 1,...,end_index - 1 remain, or -1 if the relaxation is accepted
+
+    #Initialize parameters    
+    objective_par, lower_bound, upper_bound = params
+    lower_nested2, upper_nested2 = nested
+    lower_breakpoints, upper_breakpoints = breakpoints
+    num_var = end_index - start_index
+    Max_index = -1
     
     #The main algorithm
     if num_var == 1:
-        Sol_vec = [upper_nested2[0]]
+        result[start_index] = upper_nested2[start_index]
     else:
         #Solve relaxation
-        Sol_vec = QRAP_median(objective_par, lower_bound, upper_bound, upper_nested2[num_var-1])
+        Sol_vec = result[start_index:end_index]
+        _QRAP_median_solve(objective_par[start_index:end_index], lower_bound[start_index:end_index], upper_bound[start_index:end_index], float(upper_nested2[end_index-1]), Sol_vec, None, lower_breakpoints.dtype.type, lower_breakpoints[start_index:end_index], upper_breakpoints[start_index:end_index])
         
-        #Search for most violated constraint
-        VAR_sum = 0
-        Max_index = -1
-        Violation_value = 0
+        #Search for most violated constraint (the first one in case of ties); the partial sums are accumulated in float64
+        VAR_sum = numpy.cumsum(Sol_vec, dtype=numpy.float64, out=sums_buffer[start_index:end_index])
+        upper_violated = VAR_sum > upper_nested2[start_index:end_index] + tolerance
+        lower_violated = ~upper_violated & (VAR_sum < lower_nested2[start_index:end_index] - tolerance)
+        violation = numpy.where(upper_violated, VAR_sum - upper_nested2[start_index:end_index], numpy.where(lower_violated, lower_nested2[start_index:end_index] - VAR_sum, -numpy.inf))
+        violation_index = int(numpy.argmax(violation))
         Violation_type = -1
-        for i in range(0,num_var):
-            VAR_sum += Sol_vec[i]
-            if VAR_sum > upper_nested2[i] + pow(10,-5):
-                if VAR_sum - upper_nested2[i] > Violation_value:
-                    Violation_value = VAR_sum - upper_nested2[i]
-                    Violation_type = 1
-                    Max_index = i
-            elif VAR_sum < lower_nested2[i] - pow(10,-5):
-                if lower_nested2[i] - VAR_sum > Violation_value:
-                    Violation_value = lower_nested2[i] - VAR_sum
-                    Violation_type = 0
-                    Max_index = i
+        if upper_violated[violation_index]:
+            Violation_type = 1
+            Max_index = start_index + violation_index
+        elif lower_violated[violation_index]:
+            Violation_type = 0
+            Max_index = start_index + violation_index
+        
+        #A violated last constraint does not split the subproblem (the relaxation cannot satisfy it within the variable bounds), so the relaxation is accepted instead of solving the same subproblem again
+        #Any other violated constraints of the subproblem are then left unrepaired
+        if Max_index == end_index - 1:
+            Violation_type = -1
+            Max_index = -1
                     
         #Set new lower and upper nested bound according to most violated constraint
         if Violation_type == 1:
             lower_nested2[Max_index] = upper_nested2[Max_index]
-            for i in range(Max_index+1,num_var):
-                lower_nested2[i] -= upper_nested2[Max_index]
-                upper_nested2[i] -= upper_nested2[Max_index]
         elif Violation_type == 0:
             upper_nested2[Max_index] = lower_nested2[Max_index]
-            for i in range(Max_index+1,num_var):
-                lower_nested2[i] -= lower_nested2[Max_index]
-                upper_nested2[i] -= lower_nested2[Max_index]
-        
-        #Do decomoposition and solve two new instances!
         if Violation_type != -1:
-            Sol_vec[0:Max_index+1] = QRAP_NC_infeasible(objective_par[0:Max_index+1], lower_bound[0:Max_index+1], upper_bound[0:Max_index+1], lower_nested2[0:Max_index+1], upper_nested2[0:Max_index+1])
-            Sol_vec[Max_index+1:num_var] = QRAP_NC_infeasible(objective_par[Max_index+1 :num_var], lower_bound[Max_index+1:num_var], upper_bound[Max_index+1:num_var], lower_nested2[Max_index+1:num_var], upper_nested2[Max_index+1:num_var])
-    return Sol_vec
\ No newline at end of file
+            #Shift both nested bound rows of the second subproblem in one pass
+            shift = upper_nested2[Max_index]
+            nested[:,Max_index+1:end_index] -= shift
+    return Max_index
+
+
+
+def _QRAP_NC_infeasible_range(params,nested,breakpoints,start_index,end_index,result,sums_buffer,tolerance):
+    #Infeasibility-guided algorithm of Van der Klauw et al. (2017) for the subproblem of the variables start_index,...,end_index - 1
+    #The decomposition into subproblems is processed with an explicit stack of index ranges instead of recursion, so deep (unbalanced) decompositions do not hit the recursion limit
+    stack = [(start_index, end_index)]
+    while stack:
+        start_index, end_index = stack.pop()
+        Max_index = _QRAP_NC_infeasible_split(params, nested, breakpoints, start_index, end_index, result, sums_buffer, tolerance)
+        
+        #Do decomoposition and solve two new instances (the first one first)!
+        #Both ranges are strictly smaller, since Max_index < end_index - 1
+        if Max_index != -1:
+            stack.append((Max_index+1, end_index))
+            stack.append((start_index, Max_index+1))
+
+
+
+def QRAP_NC_infeasible(objective_par,lower_bound,upper_bound,lower_nested,upper_nested,dtype=numpy.float64):
+    #Compute optimal solution to QRAP_NC via infeasibility-guided algorithm of Van der Klauw et al. (2017)
+    #dtype (optional): floating point type of the variable parameters and the solution; numpy.float32 halves their memory traffic, at the cost of a looser violation tolerance (1e-4 instead of 1e-5)
+    #Pack the variable parameters into one contiguous (3, num_var) array (rows: objective_par, lower_bound, upper_bound)
+    #The nested bounds are working copies in a (2, num_var) array (rows: lower_nested2, upper_nested2) that is always float64, like the partial sums they are compared with: they grow with the number of variables, so float32 rounding and shifting would dominate the error
+    num_var = len(objective_par)
+    _check_lengths(num_var, lower_bound, upper_bound, lower_nested, upper_nested)
+    params = numpy.empty((3,num_var), dtype=dtype)
+    params[0] = objective_par
+    params[1] = lower_bound
+    params[2] = upper_bound
+    nested = numpy.empty((2,num_var), dtype=numpy.float64)
+    nested[0] = lower_nested
+    nested[1] = upper_nested
+    breakpoints = params[1:3]/params[0]
+    result = numpy.zeros(num_var, dtype=dtype)
+    sums_buffer = numpy.empty(num_var, dtype=numpy.float64)
+    if numpy.dtype(dtype) == numpy.float64:
+        tolerance = _TOL
+    else:
+        tolerance = _TOL_FLOAT32
+    
+    _QRAP_NC_infeasible_range(params, nested, breakpoints, 0, num_var, result, sums_buffer, tolerance)
+    return result
\ No newline at end of file
@@ -0,0 +1,13 @@
+#Regression checks for the algorithms in Algorithms_QRAP_NC.py
+import numpy
+import pytest
+
+from Algorithms_QRAP_NC import QRAP_NC_infeasible
+
+
+@pytest.mark.timeout(60)
+def test_QRAP_NC_infeasible_violated_last_constraint_accepts_relaxation():
+    #The relaxation cannot reach the last nested bound (5) within the variable bounds, so the most violated constraint is the last one
+    #The relaxation is accepted as it is, which leaves the violated first constraint (upper_nested[0] = 0.5) unrepaired
+    solution = QRAP_NC_infeasible(numpy.array([1.0,1.0]), numpy.array([0.0,0.0]), numpy.array([1.0,1.0]), numpy.array([0.0,5.0]), numpy.array([0.5,5.0]))
+    assert numpy.array_equal(solution, numpy.array([1.0,1.0]))